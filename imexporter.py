@@ -8,10 +8,20 @@ Exports iMessage DM history for selected contacts into JSON/CSV files in iCloud,
 builds rollups, and supports auto-run via a LaunchAgent.
 """
 
-import os, sys, json, csv, sqlite3, textwrap, shutil, subprocess
-from datetime import datetime, timedelta, timezone
+import os, sys, json, sqlite3, shutil, functools
+# csv, textwrap and subprocess are imported lazily where used: launchd
+# pays interpreter startup every --auto-run tick, and a no-op run needs
+# none of them
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
+# orjson is optional but much faster; fall back to stdlib json if missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Constants / Paths (these now match your installer + uninstaller)
 # ─────────────────────────────────────────────────────────────────────────────
@@ -35,6 +45,16 @@ ME_AVATAR = DATA_ROOT / "_me" / "avatar.png"
 
 CONFIG_JSON = APP_DIR / "config.json"
 
+# Auto-run sentinel: highest message ROWID seen by the last completed
+# run, so idle launchd ticks can bail before touching any contact state
+SENTINEL_JSON = APP_DIR / "last_seen_max_rowid.json"
+
+# Local staging area. iCloud paths are a sync boundary, not a normal
+# filesystem: files can be dataless (reads stall on network) and renames
+# across the boundary aren't atomic. All working files live here; finished
+# files are copied into DATA_ROOT and renamed inside the iCloud volume.
+STAGE_DIR = APP_DIR / "stage"
+
 # LaunchAgent (this matches install_imexporter.sh)
 LAUNCH_PLIST = HOME / "Library" / "LaunchAgents" / "com.ste.imexporter.plist"
 
@@ -52,44 +72,105 @@ DB_PATHS = [
 
 def banner():
     year = datetime.now().year
-    print("="*59)
-    print(" iMessage Exporter (imexporter)".center(59))
-    print("="*59)
-    print(f"MIT © Stephen Curtis, {year}")
-    print()
+    sys.stdout.write(
+        "=" * 59 + "\n"
+        + " iMessage Exporter (imexporter)".center(59) + "\n"
+        + "=" * 59 + "\n"
+        + f"MIT © Stephen Curtis, {year}\n\n"
+    )
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Utilities
 # ─────────────────────────────────────────────────────────────────────────────
 
+# ensure_dirs runs from both main() and run_export, so the mkdir/stat
+# round only happens on the first call of the process
+_dirs_ready = False
+
 def ensure_dirs():
-    APP_DIR.mkdir(parents=True, exist_ok=True)
-    LOG_DIR.mkdir(parents=True, exist_ok=True)
-    DATA_ROOT.mkdir(parents=True, exist_ok=True)
-    (DATA_ROOT / "_me").mkdir(parents=True, exist_ok=True)
+    global _dirs_ready
+    if _dirs_ready:
+        return
+    for d in (APP_DIR, STAGE_DIR, LOG_DIR, DATA_ROOT, DATA_ROOT / "_me"):
+        d.mkdir(parents=True, exist_ok=True)
+    _dirs_ready = True
 
 def load_config():
     cfg = {
         "python_path": PY_DEFAULT,
-        "refresh_minutes": 30
+        "refresh_minutes": 30,
+        "emit_csv": True
     }
     if CONFIG_JSON.exists():
         try:
-            cfg.update(json.loads(CONFIG_JSON.read_text()))
+            cfg.update(_loads(CONFIG_JSON.read_bytes()))
         except Exception:
             pass
     return cfg
 
 def save_config(cfg):
-    CONFIG_JSON.write_text(json.dumps(cfg, indent=2))
+    _atomic_write_bytes(CONFIG_JSON, _dumps(cfg, pretty=True))
+
+# Precompiled stdlib encoders: json.dumps builds a fresh JSONEncoder and
+# re-resolves its options on every call, so the fallback paths reuse
+# these instead. The pretty one also streams the legacy-array rebuild
+# via iterencode.
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+_PRETTY_ENCODER = json.JSONEncoder(ensure_ascii=False, indent=2)
+
+def _dumps(obj, pretty=False):
+    """Serialize to UTF-8 bytes. pretty=True keeps 2-space indent for
+    the human-edited files (index.json, config.json); everything the
+    scripts consume is written compact."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return _PRETTY_ENCODER.encode(obj).encode("utf-8")
+    return _ENCODER.encode(obj).encode("utf-8")
+
+def _dumps_jsonl(obj):
+    """One JSONL line, trailing newline included (orjson appends it in C)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (_ENCODER.encode(obj) + "\n").encode("utf-8")
+
+def _loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _atomic_write_bytes(path, data):
+    """Write bytes to path crash-safely: one fd, one write, fsync, rename."""
+    tmp = str(path) + ".tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp, str(path))
 
-def print_ok(msg):   print(f"✅ {msg}")
-def print_fail(msg): print(f"❌ {msg}")
-def print_info(msg): print(f"• {msg}")
+# When set (auto-run), log lines are collected here and emitted with a
+# single write at the end of the run instead of a print per contact.
+_out_buffer = None
+
+def _say(line):
+    if _out_buffer is not None:
+        _out_buffer.append(line)
+    else:
+        print(line)
+
+def print_ok(msg):   _say(f"✅ {msg}")
+def print_fail(msg): _say(f"❌ {msg}")
+def print_info(msg): _say(f"• {msg}")
 
 def iso_now():
     return datetime.now().astimezone().replace(microsecond=0).isoformat()
 
+# Hoisted out of apple_time_to_iso: the Apple-to-Unix epoch offset.
+_APPLE_UNIX_DELTA = 978307200  # seconds from 1970-01-01 to 2001-01-01
+
+@functools.lru_cache(maxsize=65536)
 def apple_time_to_iso(apple_time):
     if apple_time is None:
         return None
@@ -98,18 +179,17 @@ def apple_time_to_iso(apple_time):
     except Exception:
         return None
 
-    base = datetime(2001, 1, 1, tzinfo=timezone.utc)
-
-    # nanoseconds?
+    # nanoseconds? (newer chat.db schemas; the batched query normalizes,
+    # but keep this helper safe for raw values)
     if abs(t) > 1_000_000_000_000:
-        dt = base + timedelta(seconds=t / 1_000_000_000)
-    else:
-        dt = base + timedelta(seconds=t)
+        t //= 1_000_000_000
 
-    return dt.astimezone().replace(microsecond=0).isoformat()
-
-def day_key_from_iso(iso):
-    return (iso or "")[:10]
+    # astimezone() per timestamp, not a hoisted tzinfo: a fixed offset
+    # would stamp historical messages with today's DST offset and
+    # disagree with the SQL rollup's DST-aware 'localtime' day keys.
+    # The lru_cache absorbs the repeat cost.
+    dt = datetime.fromtimestamp(t + _APPLE_UNIX_DELTA).astimezone()
+    return dt.isoformat()
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Messages DB helpers
@@ -125,66 +205,208 @@ def open_db():
     db_path = find_messages_db()
     if not db_path:
         raise FileNotFoundError("Messages chat.db not found. Check Full Disk Access.")
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
+    # Read-only URI open: no journal/locking work on our side, and SQLite
+    # refuses writes at the VFS level rather than just via query_only.
+    # Not immutable=1 — Messages.app writes chat.db while we read, and
+    # immutable tells SQLite to skip the WAL entirely (stale/torn reads).
+    # A larger statement cache lets repeated query shapes skip re-parsing;
+    # isolation_level=None leaves transaction control to the caller.
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True,
+                           isolation_level=None, cached_statements=256)
+    # Messages.app already keeps chat.db in WAL mode, so readers don't
+    # block its writer — no journal-mode pragma needed (and a mode=ro
+    # connection couldn't change it anyway); query_only guards against
+    # accidental writes through this connection.
+    for pragma in (
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA cache_size=-65536",
+        "PRAGMA query_only=1",
+    ):
+        try:
+            conn.execute(pragma)
+        except sqlite3.Error:
+            pass
+    # Give the interpreter a chance to deliver Ctrl-C during long
+    # statements (the first-run GROUP BY can chew through years of
+    # history inside a single execute): every ~1M VDBE ops the callback
+    # runs Python code, where a pending KeyboardInterrupt fires and
+    # aborts the query cleanly.
+    conn.set_progress_handler(lambda: 0, 1_000_000)
     return conn
 
-def fetch_handle_ids_for_number(conn, number):
-    like = number.replace(" ", "")
+def fetch_handle_ids_for_number(conn, number, state=None, handle_version=None):
+    # Handles are near-stable: reuse the ids resolved on a previous run
+    # (cached in state.json) and skip the query entirely. The cache is
+    # keyed on the handle-table row count, so a contact registering a new
+    # device or address gets re-resolved on the next run.
+    if state:
+        cached = state.get("handle_ids")
+        if cached and state.get("handle_version") == handle_version:
+            return list(cached)
+
+    norm, bare = _number_variants(number)
     cur = conn.cursor()
+
+    # iMessage handle ids are E.164 numbers or email addresses, so anchored
+    # equality covers the normal cases — both probes hit the unique index
+    # on handle.id instead of the leading-% LIKE scan.
     cur.execute(
-        """
-        SELECT ROWID, id
-        FROM handle
-        WHERE id LIKE ? OR id LIKE ?
-        """,
-        (f"%{like}", f"%{like.replace('+','')}"),
+        "SELECT ROWID FROM handle WHERE id = ? OR id = ?",
+        (f"+{bare}", bare),
     )
-    rows = cur.fetchall()
-    return [r["ROWID"] for r in rows]
+    ids = [r[0] for r in cur.fetchall()]
+
+    if not ids:
+        # Fallback for oddly formatted handles: the old suffix match
+        cur.execute(
+            "SELECT ROWID FROM handle WHERE id LIKE ? OR id LIKE ?",
+            (f"%{norm}", f"%{bare}"),
+        )
+        ids = [r[0] for r in cur.fetchall()]
+
+    if state is not None and ids:
+        state["handle_ids"] = ids
+        state["handle_version"] = handle_version
+    return ids
+
+# Formatting characters people paste into phone numbers, stripped in one
+# C-level translate instead of chained replace() calls
+_NUM_STRIP = str.maketrans("", "", " -()")
+
+@functools.lru_cache(maxsize=256)
+def _number_variants(number):
+    """(normalized, bare) probe variants for one configured number."""
+    norm = number.translate(_NUM_STRIP)
+    return norm, norm.lstrip("+")
+
+_CONTACT_CLAUSE = ("(m.handle_id IN (SELECT value FROM json_each(?))"
+                   " AND m.ROWID > ?)")
+
+def fetch_messages_for_contacts(conn, contact_handles, states):
+    """One SELECT covering every contact, with per-contact since-rowid
+    filtering baked into the WHERE clause. Rows come back in plain ROWID
+    (chronological) order — a contact usually owns several handle rows
+    (iMessage + SMS), and ordering by handle first would interleave their
+    history out of sequence in the appended files."""
+    # Bind each contact's handle list as one JSON array via json_each, so
+    # the SQL shape (and the prepared statement) doesn't vary with how many
+    # handles a contact resolves to. A contact with no last_rowid binds -1
+    # ("everything") rather than switching to a second clause shape: the
+    # statement text then depends only on the contact count, so the
+    # connection's statement cache serves every variant after the first.
+    clauses = []
+    params = []
+    for number, handle_ids in contact_handles.items():
+        since = states[number].get("last_rowid")
+        clauses.append(_CONTACT_CLAUSE)
+        params.extend((_dumps(list(handle_ids)).decode(),
+                       since if since is not None else -1))
+
+    # Normalize the timestamp to seconds inside SQLite (newer schemas store
+    # nanoseconds). Beyond moving the branch+divide into C, this is what
+    # lets the lru_cache on apple_time_to_iso actually hit: nanosecond
+    # values are effectively unique per message, second values repeat.
+    sql = f"""
+    SELECT
+        m.handle_id,
+        m.ROWID,
+        CASE WHEN abs(m.date) > 1000000000000
+             THEN m.date / 1000000000
+             ELSE m.date END,
+        m.is_from_me,
+        m.text
+    FROM message m
+    WHERE {" OR ".join(clauses)}
+    ORDER BY m.ROWID ASC
+    """
 
-def fetch_messages_for_handles(conn, handle_ids, since_rowid=None):
+    # Pin the stock Apple index on message.handle_id for the first-run
+    # import, where a planner misstep (full message scan) is the
+    # worst-case latency. INDEXED BY fails to prepare if the index is
+    # missing or unusable, so fall back to the planner's own choice —
+    # schemas without it (or future renames) just lose the hint.
+    cur = conn.cursor()
+    try:
+        cur.execute(sql.replace(
+            "FROM message m",
+            "FROM message m INDEXED BY message_idx_handle_id", 1), params)
+    except sqlite3.OperationalError:
+        cur.execute(sql, params)
+    return cur
+
+def fetch_rollup_for_handles(conn, handle_ids, since_rowid=None,
+                             until_rowid=None):
+    """Build per-day [me, them, total] buckets entirely inside SQLite.
+
+    One GROUP BY in C instead of a Python loop: without since_rowid it
+    aggregates the full history (initial build, or rollup.json gone
+    missing); with it, only the delta beyond that ROWID, ready to be
+    merged into the existing buckets. until_rowid caps the aggregate at
+    the run's own high-water mark — finalize runs on a fresh connection,
+    so without the bound a message arriving mid-run would be counted now
+    and again next run when it's appended. The date arithmetic mirrors
+    apple_time_to_iso.
+    """
     if not handle_ids:
-        return []
-
-    params = list(handle_ids)
-    handle_clause = ",".join("?" for _ in handle_ids)
+        return {}
 
-    where = f"m.handle_id IN ({handle_clause})"
-    if since_rowid is not None:
-        where += " AND m.ROWID > ?"
-        params.append(since_rowid)
-
-    sql = f"""
+    sql = """
     SELECT
-        m.ROWID          AS rowid,
-        m.date           AS date,
-        m.is_from_me     AS is_from_me,
-        m.text           AS text
+        date(CASE WHEN abs(m.date) > 1000000000000
+                  THEN m.date / 1000000000
+                  ELSE m.date END + 978307200, 'unixepoch', 'localtime') AS day,
+        SUM(m.is_from_me),
+        SUM(1 - m.is_from_me),
+        COUNT(*)
     FROM message m
-    WHERE {where}
-    ORDER BY m.ROWID ASC
+    WHERE m.handle_id IN (SELECT value FROM json_each(?))
+      AND m.ROWID > ?
+      AND m.ROWID <= ?
+    GROUP BY day
     """
 
     cur = conn.cursor()
-    cur.execute(sql, params)
-    return cur.fetchall()
+    cur.execute(sql, (_dumps(list(handle_ids)).decode(),
+                      since_rowid if since_rowid is not None else -1,
+                      until_rowid if until_rowid is not None
+                      else 0x7FFFFFFFFFFFFFFF))
+    return {day: [me, them, total] for day, me, them, total in cur if day}
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Contact index (index.json)
 # ─────────────────────────────────────────────────────────────────────────────
 
+STAGE_INDEX_JSON = STAGE_DIR / "index.json"
+
+# Parsed index, cached for the life of the process. Saves are
+# write-through, so the cache only ever removes the re-read+re-parse on
+# each menu action / helper call.
+_index_cache = None
+
 def load_index():
-    if not INDEX_JSON.exists():
-        return {"contacts": []}
-    try:
-        return json.loads(INDEX_JSON.read_text())
-    except Exception:
-        return {"contacts": []}
+    global _index_cache
+    if _index_cache is not None:
+        return _index_cache
+    STAGE_DIR.mkdir(parents=True, exist_ok=True)
+    adopt_from_icloud(STAGE_INDEX_JSON, INDEX_JSON)
+    if STAGE_INDEX_JSON.exists():
+        try:
+            _index_cache = _loads(STAGE_INDEX_JSON.read_bytes())
+        except Exception:
+            _index_cache = {"contacts": []}
+    else:
+        _index_cache = {"contacts": []}
+    return _index_cache
 
 def save_index(data):
+    global _index_cache
+    _index_cache = data
+    STAGE_DIR.mkdir(parents=True, exist_ok=True)
     DATA_ROOT.mkdir(parents=True, exist_ok=True)
-    INDEX_JSON.write_text(json.dumps(data, indent=2, ensure_ascii=False))
+    _atomic_write_bytes(STAGE_INDEX_JSON, _dumps(data, pretty=True))
+    publish_file(STAGE_INDEX_JSON, INDEX_JSON)
 
 def list_contacts():
     idx = load_index()
@@ -220,128 +442,471 @@ def disable_contact(number):
 # State per contact
 # ─────────────────────────────────────────────────────────────────────────────
 
-def contact_dir(number):
-    d = DATA_ROOT / number
-    d.mkdir(parents=True, exist_ok=True)
+# Directories already created this session. state_path and friends are
+# called several times per contact per run, and each mkdir is a stat +
+# potential create — on the iCloud side those go through FileProvider
+# and are far from free.
+_ensured_dirs = set()
+
+def _ensure_dir(d):
+    if d not in _ensured_dirs:
+        d.mkdir(parents=True, exist_ok=True)
+        _ensured_dirs.add(d)
     return d
 
+def contact_dir(number):
+    return _ensure_dir(DATA_ROOT / number)
+
+def stage_contact_dir(number):
+    return _ensure_dir(STAGE_DIR / number)
+
+def adopt_from_icloud(stage_path, cloud_path):
+    """Pull an existing iCloud file into the local stage once (first run
+    after upgrade). Afterwards the stage copy is canonical and we never
+    read back through the sync boundary."""
+    if not stage_path.exists() and cloud_path.exists():
+        try:
+            shutil.copyfile(cloud_path, stage_path)
+        except OSError:
+            pass
+
+def publish_file(stage_path, cloud_path):
+    """Copy a finished stage file into iCloud: the full write happens
+    locally first, then a copy + rename entirely inside the iCloud
+    volume — never a rename across the sync boundary."""
+    tmp = cloud_path.with_name(cloud_path.name + ".tmp")
+    shutil.copyfile(stage_path, tmp)
+    tmp.replace(cloud_path)
+
 def state_path(number):
-    return contact_dir(number) / "state.json"
+    return stage_contact_dir(number) / "state.json"
+
+# Parsed per-contact state, cached like the index: one read per number
+# per process, write-through on save.
+_state_cache = {}
 
 def load_state(number):
+    cached = _state_cache.get(number)
+    if cached is not None:
+        return cached
     p = state_path(number)
-    if not p.exists():
-        return {"last_rowid": None, "last_run": None}
-    try:
-        return json.loads(p.read_text())
-    except Exception:
-        return {"last_rowid": None, "last_run": None}
+    adopt_from_icloud(p, contact_dir(number) / "state.json")
+    state = {"last_rowid": None, "last_run": None}
+    if p.exists():
+        try:
+            state = _loads(p.read_bytes())
+        except Exception:
+            pass
+    _state_cache[number] = state
+    return state
 
-def save_state(number, state):
+def save_state(number, state, publish=True):
+    # publish=False keeps the write local-only: nothing reads the iCloud
+    # copy of state.json, so idle runs needn't touch the sync boundary.
+    _state_cache[number] = state
     p = state_path(number)
-    tmp = p.with_suffix(".tmp")
-    tmp.write_text(json.dumps(state, indent=2))
-    tmp.replace(p)
+    _atomic_write_bytes(p, _dumps(state))
+    if publish:
+        publish_file(p, contact_dir(number) / "state.json")
+
+# State writes queued during an export, flushed in one pass at the end of
+# the run so the OS can coalesce the small files instead of syncing one
+# per contact mid-run. Queued from finalize worker threads (dict ops are
+# GIL-atomic); flushed on the main thread.
+_pending_states = {}
+
+def queue_state(number, state, publish=True):
+    _state_cache[number] = state
+    _pending_states[number] = (state, publish)
+
+def flush_states():
+    # Safe to flush even after a partial run: a queued state only exists
+    # once its contact's rows are already in the stage JSONL.
+    while _pending_states:
+        number, (state, publish) = _pending_states.popitem()
+        save_state(number, state, publish)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Export logic
 # ─────────────────────────────────────────────────────────────────────────────
 
-def export_for_contact(conn, number, label):
-    handles = fetch_handle_ids_for_number(conn, number)
-    if not handles:
-        print_fail(f"{number}: no matching handles found in Messages db")
+def migrate_legacy_json(number):
+    """One-off: convert the old full-array messages_<num>_dm.json into a
+    JSONL file in the local stage."""
+    json_path = contact_dir(number) / f"messages_{number}_dm.json"
+    jsonl_path = stage_contact_dir(number) / f"messages_{number}_dm.jsonl"
+    if jsonl_path.exists() or not json_path.exists():
         return
-
-    st = load_state(number)
-    last_rowid = st.get("last_rowid")
-
-    rows = fetch_messages_for_handles(conn, handles, since_rowid=last_rowid)
-
-    if not rows and last_rowid is not None:
-        # Nothing new
-        print_info(f"{number} ({label}): no new messages")
-        st["last_run"] = iso_now()
-        save_state(number, st)
+    try:
+        records = _loads(json_path.read_bytes())
+    except Exception:
         return
-
-    if not rows and last_rowid is None:
-        # No messages at all
-        print_info(f"{number} ({label}): no messages found")
-        st["last_run"] = iso_now()
-        save_state(number, st)
+    tmp = jsonl_path.with_suffix(".tmp")
+    with tmp.open("wb") as f:
+        if records:
+            # Same bulk-encode shape as the export path: map() keeps the
+            # encode loop in C, one write for the whole file
+            f.write(b"".join(map(_dumps_jsonl, records)))
+    tmp.replace(jsonl_path)
+
+# Parsed JSON keyed by (path -> mtime_ns, object): consecutive in-process
+# runs re-read the per-contact rollup and text index only when the file
+# actually changed underneath us. Writes go through _atomic_write_bytes,
+# which bumps mtime, so stale entries revalidate on the next read.
+_json_cache = {}
+
+def _read_json_cached(path, default):
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return default
+    cached = _json_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        obj = _loads(path.read_bytes())
+    except Exception:
+        return default
+    _json_cache[path] = (mtime, obj)
+    return obj
+
+def migrate_legacy_text_index(number):
+    """One-off: convert the old single-document text_index.json sidecar
+    into the append-only .jsonl form."""
+    sdir = stage_contact_dir(number)
+    legacy = sdir / "text_index.json"
+    jsonl = sdir / "text_index.jsonl"
+    if jsonl.exists():
         return
+    adopt_from_icloud(legacy, contact_dir(number) / legacy.name)
+    if not legacy.exists():
+        return
+    try:
+        texts = _loads(legacy.read_bytes())
+    except Exception:
+        return
+    tmp = jsonl.with_suffix(".tmp")
+    with tmp.open("wb") as f:
+        if texts:
+            f.write(b"".join(map(_dumps_jsonl, texts)))
+    tmp.replace(jsonl)
+
+def load_text_index(text_index_path):
+    """Load the text dedup sidecar: one JSON-encoded string per line,
+    append-only like the message store."""
+    try:
+        mtime = os.stat(text_index_path).st_mtime_ns
+    except OSError:
+        return []
+    cached = _json_cache.get(text_index_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        texts = [_loads(line)
+                 for line in text_index_path.read_bytes().splitlines()
+                 if line.strip()]
+    except Exception:
+        return []
+    _json_cache[text_index_path] = (mtime, texts)
+    return texts
+
+def load_rollup_days(rollup_path):
+    obj = _read_json_cached(rollup_path, None)
+    if isinstance(obj, dict):
+        return obj.get("days", {})
+    return {}
+
+def _jsonl_tail_rowid(jsonl_path):
+    """ROWID of the last record already in a JSONL store (0 when the file
+    is missing, empty, or unreadable). Reads a bounded tail of the file,
+    widening only if the final record is longer than the window."""
+    try:
+        with jsonl_path.open("rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            back = 1 << 16
+            while True:
+                f.seek(max(0, size - back))
+                lines = [l for l in f.read().splitlines() if l.strip()]
+                if not lines:
+                    return 0
+                # The first captured line may be a partial record unless we
+                # read from the start of the file; the last is always whole
+                if len(lines) > 1 or back >= size:
+                    return int(_loads(lines[-1]).get("rowid") or 0)
+                back *= 4
+    except Exception:
+        return 0
 
-    # Merge with existing json
+def rebuild_legacy_json(number):
+    """Regenerate the full-array .json from the JSONL store (on demand only)."""
+    sdir = stage_contact_dir(number)
+    jsonl_path = sdir / f"messages_{number}_dm.jsonl"
+    json_path = sdir / f"messages_{number}_dm.json"
+    # Adopt the sidecar along with the store: on a fresh stage the texts
+    # behind the "t" refs only exist on the iCloud side
+    adopt_from_icloud(jsonl_path, contact_dir(number) / jsonl_path.name)
+    adopt_from_icloud(sdir / "text_index.jsonl",
+                      contact_dir(number) / "text_index.jsonl")
+    if not jsonl_path.exists():
+        print_fail(f"{number}: no JSONL store to rebuild from")
+        return
+    migrate_legacy_text_index(number)
+    texts = load_text_index(sdir / "text_index.jsonl")
+    records = []
+    with jsonl_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = _loads(line)
+            # Expand text references; records written before the dedup
+            # table carry the full text inline
+            if "t" in rec:
+                tix = rec.pop("t")
+                if not 0 <= tix < len(texts):
+                    # A rebuild with nulled-out texts is worse than no
+                    # rebuild — refuse rather than fabricate
+                    print_fail(f"{number}: text index has no entry {tix}; "
+                               "aborting rebuild")
+                    return
+                rec["text"] = texts[tix]
+            records.append(rec)
+    # The rebuilt array is the one file that still serializes full history.
+    # Stream it with json.dump into a large write buffer instead of
+    # building the whole pretty-printed string in memory first.
+    tmp = str(json_path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.writelines(_PRETTY_ENCODER.iterencode(records))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, str(json_path))
+    publish_file(json_path, contact_dir(number) / json_path.name)
+    print_ok(f"{number}: rebuilt {json_path.name} ({len(records)} messages)")
+
+def make_contact_writer(number, label, state, handles, emit_csv=True):
+    """Create a lazy writer for one contact's output files.
+
+    write_row is fed (rowid, date_raw, is_from_me, text) from the batched
+    query in ascending ROWID order; finalize() closes the files, writes
+    the rollup and state, and returns the number of new messages.
+    emit_csv=False skips the CSV entirely for setups where only the JSON
+    outputs are consumed.
+    """
     cdir = contact_dir(number)
-    json_path = cdir / f"messages_{number}_dm.json"
-    csv_path = cdir / f"messages_{number}_dm.csv"
-    rollup_path = cdir / "rollup.json"
-
-    existing = []
-    if json_path.exists():
-        try:
-            existing = json.loads(json_path.read_text())
-        except Exception:
-            existing = []
-
-    new_records = []
+    sdir = stage_contact_dir(number)
+    jsonl_path = sdir / f"messages_{number}_dm.jsonl"
+    csv_path = sdir / f"messages_{number}_dm.csv"
+    rollup_path = sdir / "rollup.json"
+    text_index_path = sdir / "text_index.jsonl"
+
+    # All appends happen against the local stage copies; finished files are
+    # published into iCloud once at finalize. Adopt any pre-stage files from
+    # iCloud first so upgrades keep their history.
+    for p in (jsonl_path, csv_path, rollup_path, text_index_path):
+        adopt_from_icloud(p, cdir / p.name)
+
+    # One-time migrations: legacy full-array .json into .jsonl, and the
+    # old single-document text index into its append-only form
+    migrate_legacy_json(number)
+    migrate_legacy_text_index(number)
+
+    last_rowid = state.get("last_rowid")
+    new_count = 0
     max_rowid = last_rowid or 0
+    tail_rowid = 0  # set at lazy open; guards against re-appending
+    jsonl_f = None
+    csv_f = None
+    csv_w = None
+    text_f = None
+    jsonl_buf = []  # pending record dicts, bulk-encoded on flush
+    csv_buf = []    # pending CSV rows, flushed via writerows in batches
+    text_buf = []   # pending new dedup-table entries
+
+    # Text dedup table: long histories repeat many small strings (reactions,
+    # links, "👍"). JSONL records store an index into text_index.jsonl via
+    # their "t" field; the CSV and rebuilt legacy .json keep the full text.
+    texts = None        # index -> text (append-only)
+    text_interned = {}  # text -> index
+    texts_published = 0 # entries already on disk
+
+    # Bind the hot callables once: write_row runs per message, and closure
+    # cell loads are cheaper than global/attribute lookups there
+    to_iso = apple_time_to_iso
+    intern_get = text_interned.get
+    jsonl_append = jsonl_buf.append
+    csv_append = csv_buf.append
+    text_append = text_buf.append
+
+    def flush_bufs():
+        if text_buf:
+            # New texts land before the records that reference them, so an
+            # interrupted run never leaves dangling "t" refs in the JSONL
+            text_f.write(b"".join(map(_dumps_jsonl, text_buf)))
+            text_f.flush()
+            text_buf.clear()
+        if jsonl_buf:
+            # map() keeps the encode loop in C; one write call per batch
+            jsonl_f.write(b"".join(map(_dumps_jsonl, jsonl_buf)))
+            jsonl_buf.clear()
+        if csv_buf:
+            csv_w.writerows(csv_buf)
+            csv_buf.clear()
+
+    # No usable rollup on disk (first run, file lost, or unparseable):
+    # rebuild it wholesale in SQLite at finalize time. Otherwise the delta
+    # beyond last_rowid is aggregated by the same GROUP BY and merged into
+    # the existing buckets — the write loop never touches day counters.
+    existing_days = load_rollup_days(rollup_path)
+    # last_rowid None with a rollup present means state.json was lost: the
+    # delta would span the full history and double-count every bucket.
+    rebuild_rollup = not existing_days or last_rowid is None
+
+    def write_row(rowid, date_raw, is_from_me, text):
+        # Fused pass: JSONL append and CSV append per row. Files open
+        # lazily on the first row so a no-op run touches nothing.
+        nonlocal jsonl_f, csv_f, csv_w, text_f, max_rowid, new_count
+        nonlocal texts, texts_published, tail_rowid
+
+        if jsonl_f is None:
+            # An interrupted run leaves flushed batches in the store while
+            # state.json still holds the previous watermark, so the query
+            # re-serves those rows. Note the file's actual tail so they are
+            # counted (rollup + watermark catch up) but not re-appended.
+            tail_rowid = _jsonl_tail_rowid(jsonl_path)
+            jsonl_f = jsonl_path.open("ab")
+            text_f = text_index_path.open("ab")
+            # Copy before mutating: load_text_index shares its list via
+            # the mtime cache
+            texts = list(load_text_index(text_index_path))
+            texts_published = len(texts)
+            text_interned.update((s, i) for i, s in enumerate(texts))
+            if emit_csv:
+                import csv
+                write_header = (not csv_path.exists()
+                                or csv_path.stat().st_size == 0)
+                csv_f = csv_path.open("a", newline="", encoding="utf-8",
+                                      buffering=1 << 20)
+                csv_w = csv.writer(csv_f)
+                if write_header:
+                    csv_w.writerow(["rowid", "date", "is_from_me", "text"])
+
+        # Rows arrive in ascending ROWID order, so the last one seen is
+        # the max — plain assignment, no comparison
+        max_rowid = rowid
+
+        if rowid <= tail_rowid:
+            # Already appended by an interrupted run whose finalize never
+            # ran — advance the counters without touching the files
+            new_count += 1
+            return
+
+        iso_ts = to_iso(date_raw)
+        ifm = bool(is_from_me)
 
-    for r in rows:
-        rowid = r["rowid"]
-        if rowid > max_rowid:
-            max_rowid = rowid
+        tix = intern_get(text)
+        if tix is None:
+            tix = len(texts)
+            texts.append(text)
+            text_interned[text] = tix
+            text_append(text)
 
-        iso_ts = apple_time_to_iso(r["date"])
-        new_records.append({
+        # Batch both outputs — encode/write once per 1000 rows instead of a
+        # Python-level call per message
+        jsonl_append({
             "rowid": rowid,
             "date": iso_ts,
-            "is_from_me": bool(r["is_from_me"]),
-            "text": r["text"],
+            "is_from_me": ifm,
+            "t": tix,
         })
+        if csv_w is not None:
+            csv_append((rowid, iso_ts, 1 if ifm else 0, text or ""))
+        if len(jsonl_buf) >= 1000:
+            flush_bufs()
+
+        new_count += 1
+
+    def finalize():
+        if jsonl_f is not None:
+            flush_bufs()
+            jsonl_f.close()
+            text_f.close()
+        if csv_f is not None:
+            csv_f.close()
+
+        if not new_count:
+            if last_rowid is not None:
+                print_info(f"{number} ({label}): no new messages")
+            else:
+                print_info(f"{number} ({label}): no messages found")
+            state["last_run"] = iso_now()
+            queue_state(number, state, publish=False)
+            return 0
 
-    merged = existing + new_records
-
-    # Write JSON
-    tmp = json_path.with_suffix(".tmp")
-    tmp.write_text(json.dumps(merged, indent=2, ensure_ascii=False))
-    tmp.replace(json_path)
-
-    # Write CSV
-    with csv_path.open("w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["rowid", "date", "is_from_me", "text"])
-        for msg in merged:
-            w.writerow([
-                msg["rowid"],
-                msg["date"],
-                1 if msg["is_from_me"] else 0,
-                msg["text"] or "",
-            ])
-
-    # Build rollup
-    days = {}
-    for msg in merged:
-        dk = day_key_from_iso(msg["date"])
-        if not dk:
-            continue
-        bucket = days.setdefault(dk, {"me": 0, "them": 0, "total": 0})
-        bucket["total"] += 1
-        if msg["is_from_me"]:
-            bucket["me"] += 1
-        else:
-            bucket["them"] += 1
+        # finalize() may run on a worker thread, so open a short-lived
+        # connection of its own rather than sharing the export one. Both
+        # aggregates stop at this run's max_rowid: rows that landed after
+        # the batched SELECT belong to the next run.
+        rconn = open_db()
+        try:
+            if rebuild_rollup:
+                # One aggregate over the full history, appended rows included
+                days_out = fetch_rollup_for_handles(rconn, handles,
+                                                    until_rowid=max_rowid)
+            else:
+                # Aggregate only the delta beyond last_rowid and merge it
+                # into the buckets already on disk
+                days_out = {dk: [b.get("me", 0), b.get("them", 0),
+                                 b.get("total", 0)]
+                            for dk, b in existing_days.items()}
+                delta = fetch_rollup_for_handles(rconn, handles,
+                                                 since_rowid=last_rowid,
+                                                 until_rowid=max_rowid)
+                for dk, (me, them, total) in delta.items():
+                    bucket = days_out.setdefault(dk, [0, 0, 0])
+                    bucket[0] += me
+                    bucket[1] += them
+                    bucket[2] += total
+        finally:
+            rconn.close()
+
+        # Days are emitted in ascending date order: ISO day keys sort
+        # lexically, so consumers that want "the last N days" can take the
+        # tail of the object without sorting it themselves
+        _atomic_write_bytes(rollup_path, _dumps({
+            "days": {dk: {"me": b[0], "them": b[1], "total": b[2]}
+                     for dk, b in sorted(days_out.items())},
+        }))
+
+        # Publish the finished stage files into iCloud in one go. A stale
+        # CSV from before emit_csv was switched off isn't re-pushed, and
+        # the text sidecar only re-publishes when it actually grew — runs
+        # whose new rows are all repeat texts skip that copy entirely.
+        publish = [jsonl_path, rollup_path]
+        if emit_csv:
+            publish.insert(1, csv_path)
+        if texts is not None and len(texts) > texts_published:
+            publish.append(text_index_path)
+        for p in publish:
+            if p.exists():
+                publish_file(p, cdir / p.name)
+
+        # One directory fsync covers the whole batch of renames above —
+        # the individual files already fsync'd their contents
+        dirfd = os.open(str(sdir), os.O_RDONLY)
+        try:
+            os.fsync(dirfd)
+        finally:
+            os.close(dirfd)
 
-    tmp_r = rollup_path.with_suffix(".tmp")
-    tmp_r.write_text(json.dumps({"days": days}, indent=2, ensure_ascii=False))
-    tmp_r.replace(rollup_path)
+        state["last_rowid"] = max_rowid
+        state["last_run"] = iso_now()
+        queue_state(number, state)
 
-    st["last_rowid"] = max_rowid
-    st["last_run"] = iso_now()
-    save_state(number, st)
+        print_ok(f"{number} ({label}): exported {new_count} new messages")
+        return new_count
 
-    print_ok(f"{number} ({label}): exported {len(new_records)} new messages (total {len(merged)})")
+    return write_row, finalize
 
 # ─────────────────────────────────────────────────────────────────────────────
 # LaunchAgent template + management
@@ -369,6 +934,8 @@ PLIST_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
 """
 
 def write_launch_agent(refresh_minutes, python):
+    """Write the LaunchAgent plist; returns True when it actually changed
+    (callers skip the launchctl reload otherwise)."""
     plist = PLIST_TEMPLATE.format(
         interval=max(60, refresh_minutes * 60),
         python=python,
@@ -376,24 +943,28 @@ def write_launch_agent(refresh_minutes, python):
         outlog=str(OUT_LOG),
         errlog=str(ERR_LOG),
     )
+    try:
+        if LAUNCH_PLIST.read_text() == plist:
+            print_info("LaunchAgent plist unchanged")
+            return False
+    except OSError:
+        pass
     LAUNCH_PLIST.write_text(plist)
     print_ok("LaunchAgent plist written")
+    return True
 
 def reload_launch_agent():
+    import subprocess
     label = "com.ste.imexporter"
-    # stop if running
+    uid = os.getuid()
+    # One shell, one fork: bootout (ignore "not loaded"), bootstrap, kickstart
     subprocess.run(
-        ["launchctl", "bootout", f"gui/{os.getuid()}/{LAUNCH_PLIST}"],
-        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-    )
-    # load fresh
-    subprocess.run(
-        ["launchctl", "bootstrap", f"gui/{os.getuid()}", str(LAUNCH_PLIST)],
-        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-    )
-    subprocess.run(
-        ["launchctl", "kickstart", "-k", f"gui/{os.getuid()}/{label}"],
-        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ["/bin/sh", "-c",
+         f"launchctl bootout 'gui/{uid}/{LAUNCH_PLIST}' 2>/dev/null; "
+         f"launchctl bootstrap gui/{uid} '{LAUNCH_PLIST}' 2>/dev/null; "
+         f"launchctl kickstart -k gui/{uid}/{label}"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        check=False,
     )
     print_ok("LaunchAgent reloaded")
 
@@ -401,15 +972,27 @@ def reload_launch_agent():
 # Settings menu
 # ─────────────────────────────────────────────────────────────────────────────
 
+@functools.lru_cache(maxsize=1)
 def scan_pythons():
+    # Memoized: interpreters don't move while we're in the menu, so the
+    # stat()s and the PATH walk run once; pick_python_menu clears the
+    # cache after a successful choice.
     cands = []
     for p in [
         "/opt/homebrew/bin/python3",
         "/usr/local/bin/python3",
         "/usr/bin/python3",
     ]:
-        if Path(p).exists():
+        if os.path.isfile(p):
             cands.append(p)
+    # python.org framework installs — glob only the known parent rather
+    # than walking anywhere near the filesystem root
+    fw = Path("/Library/Frameworks/Python.framework/Versions")
+    if fw.is_dir():
+        for p in sorted(fw.glob("3.*/bin/python3")):
+            sp = str(p)
+            if sp not in cands and p.is_file():
+                cands.append(sp)
     which = shutil.which("python3")
     if which and which not in cands:
         cands.append(which)
@@ -431,8 +1014,9 @@ def pick_python_menu(cfg):
     chosen = cands[choice - 1]
     cfg["python_path"] = chosen
     save_config(cfg)
-    write_launch_agent(cfg["refresh_minutes"], cfg["python_path"])
-    reload_launch_agent()
+    scan_pythons.cache_clear()
+    if write_launch_agent(cfg["refresh_minutes"], cfg["python_path"]):
+        reload_launch_agent()
 
 def settings_menu():
     cfg = load_config()
@@ -455,12 +1039,12 @@ def settings_menu():
                 mins = 1
             cfg["refresh_minutes"] = mins
             save_config(cfg)
-            write_launch_agent(cfg["refresh_minutes"], cfg["python_path"])
-            reload_launch_agent()
+            if write_launch_agent(cfg["refresh_minutes"], cfg["python_path"]):
+                reload_launch_agent()
         elif choice == "2":
             pick_python_menu(cfg)
         elif choice == "3":
-            print(json.dumps(cfg, indent=2))
+            print(_dumps(cfg, pretty=True).decode())
             print(f"App dir:   {APP_DIR}")
             print(f"Data root: {DATA_ROOT}")
         elif choice == "0":
@@ -471,41 +1055,139 @@ def settings_menu():
 # ─────────────────────────────────────────────────────────────────────────────
 
 def run_export(auto=False):
-    ensure_dirs()
-    idx = load_index()
-
-    # NEW: validate contacts before running
-    raw = idx.get("contacts", [])
-    contacts = []
-
-    for c in raw:
-        number = c.get("number")
-        if not number:
-            print_fail("Skipping malformed contact in index.json (missing 'number')")
-            continue
-        if not c.get("enabled", True):
-            continue
-        contacts.append(c)
+    global _out_buffer
+    if auto:
+        _out_buffer = []
+    try:
+        ensure_dirs()
+        idx = load_index()
+        emit_csv = load_config().get("emit_csv", True)
+
+        # NEW: validate contacts before running
+        raw = idx.get("contacts", [])
+        contacts = []
+
+        for c in raw:
+            number = c.get("number")
+            if not number:
+                print_fail("Skipping malformed contact in index.json (missing 'number')")
+                continue
+            if not c.get("enabled", True):
+                continue
+            contacts.append(c)
 
-    if not contacts:
-        print_info("No enabled contacts with valid numbers found. Nothing to export.")
-        return
+        if not contacts:
+            print_info("No enabled contacts with valid numbers found. Nothing to export.")
+            return
 
-    conn = open_db()
-    try:
-        changed = 0
-        for c in contacts:
-            num = c["number"]
-            label = c.get("label", num)
-            before = load_state(num)
-            before_id = before.get("last_rowid")
-            export_for_contact(conn, num, label)
-            after = load_state(num)
-            if after.get("last_rowid") != before_id:
-                changed += 1
-        print_info(f"Checked at {iso_now()}: {changed} contacts had new messages")
+        conn = open_db()
+        try:
+            # One read transaction for the whole run: a single shared lock
+            # and one consistent snapshot instead of an implicit transaction
+            # per statement. isolation_level=None means the BEGIN must be
+            # explicit — `with conn:` alone only handles commit/rollback.
+            with conn:
+                conn.execute("BEGIN DEFERRED")
+
+                # Idle short-circuit for the launchd path: most ticks find
+                # nothing new, and MAX(ROWID) is an O(1) btree probe. The
+                # sentinel also records the contact set so adding a contact
+                # forces a real pass. Interactive runs always do the work.
+                max_mid = conn.execute(
+                    "SELECT MAX(ROWID) FROM message").fetchone()[0] or 0
+                contact_numbers = sorted(c["number"] for c in contacts)
+                if auto:
+                    sent = _read_json_cached(SENTINEL_JSON, None)
+                    if (isinstance(sent, dict)
+                            and sent.get("contacts") == contact_numbers
+                            and max_mid <= sent.get("max_rowid", -1)):
+                        print_info(f"Checked at {iso_now()}: "
+                                   "no new messages in chat.db")
+                        return
+
+                # Cheap cache key for the per-contact handle ids: the handle
+                # table only ever grows, so its row count changes whenever a
+                # contact could have gained a new handle
+                handle_version = conn.execute(
+                    "SELECT COUNT(*) FROM handle").fetchone()[0]
+
+                by_number = {}
+                states = {}
+                contact_handles = {}
+                for c in contacts:
+                    num = c["number"]
+                    by_number[num] = c
+                    states[num] = load_state(num)
+                    handles = fetch_handle_ids_for_number(
+                        conn, num, states[num], handle_version)
+                    if not handles:
+                        print_fail(f"{num}: no matching handles found in Messages db")
+                        continue
+                    contact_handles[num] = handles
+
+                handle_to_number = {h: num
+                                    for num, hs in contact_handles.items()
+                                    for h in hs}
+                writers = {}
+
+                def writer_for(num):
+                    if num not in writers:
+                        label = by_number[num].get("label", num)
+                        writers[num] = make_contact_writer(
+                            num, label, states[num], contact_handles[num],
+                            emit_csv=emit_csv)
+                    return writers[num]
+
+                if contact_handles:
+                    # One batched query for every contact; rows arrive in
+                    # chronological (ROWID) order and are dispatched one by
+                    # one to the owning contact's writer, keeping each
+                    # contact's files in strict ROWID order even when the
+                    # contact owns several handles (iMessage + SMS).
+                    cur = fetch_messages_for_contacts(conn, contact_handles, states)
+                    row_writers = {}  # handle_id -> write_row
+                    for handle_id, rowid, date_raw, ifm, text in cur:
+                        wr = row_writers.get(handle_id)
+                        if wr is None:
+                            num = handle_to_number.get(handle_id)
+                            if num is None:
+                                continue
+                            wr = writer_for(num)[0]
+                            row_writers[handle_id] = wr
+                        wr(rowid, date_raw, ifm, text)
+
+                # Finalize contacts in parallel: the remaining work is file I/O
+                # (rollup/state writes plus the copy into iCloud), which overlaps
+                # well across contacts. SQLite reads stay on this thread.
+                changed = 0
+                finalizers = [writer_for(num)[1] for num in contact_handles]
+                if finalizers:
+                    workers = min(len(finalizers), os.cpu_count() or 2, 8)
+                    with ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="finalize") as pool:
+                        for n_new in pool.map(lambda fin: fin(), finalizers):
+                            if n_new:
+                                changed += 1
+
+                print_info(f"Checked at {iso_now()}: {changed} contacts had new messages")
+
+                if auto:
+                    _atomic_write_bytes(SENTINEL_JSON, _dumps({
+                        "max_rowid": max_mid,
+                        "contacts": contact_numbers,
+                    }))
+        finally:
+            flush_states()
+            try:
+                conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+            conn.close()
     finally:
-        conn.close()
+        if auto:
+            buf, _out_buffer = _out_buffer, None
+            if buf:
+                sys.stdout.write("\n".join(buf) + "\n")
 
 # ─────────────────────────────────────────────────────────────────────────────
 # CLI menus
@@ -546,6 +1228,15 @@ def main():
         run_export(auto=True)
         return 0
 
+    if "--rebuild-json" in sys.argv:
+        for c in list_contacts():
+            number = c.get("number")
+            if not number:
+                print_fail("Skipping malformed contact in index.json (missing 'number')")
+                continue
+            rebuild_legacy_json(number)
+        return 0
+
     while True:
         print("Main Menu")
         print("---------")
@@ -566,6 +1257,7 @@ def main():
         elif choice == "4":
             settings_menu()
         elif choice == "5":
+            import textwrap
             print()
             print("Help")
             print("----")
@@ -574,10 +1266,12 @@ def main():
                 • Data is written under iCloud Drive:
                     Documents/Social/Messaging/iMessage/
                 • Each contact gets:
-                    messages_<number>_dm.json
-                    messages_<number>_dm.csv
+                    messages_<number>_dm.jsonl   (append-only store)
+                    messages_<number>_dm.csv     (if CSV export is enabled)
                     rollup.json
                     state.json
+                • Run with --rebuild-json to regenerate the legacy
+                  messages_<number>_dm.json array from the .jsonl store.
                 • Use Settings to choose Python and auto-run interval.
             """).strip())
         elif choice == "0":